@@ -1,7 +1,11 @@
 # Test the value-based algorithms with PyTorch.
 
 from argparse import Namespace
+from gym import spaces
 from xuance import get_runner
+from xuance.torch.utils import PerOffPolicyBuffer_Device
+import numpy as np
+import torch
 import unittest
 
 n_steps = 10000
@@ -20,6 +24,12 @@ class TestValueBaseAlgo(unittest.TestCase):
         runner = get_runner(method="ddqn", env='classic_control', env_id='CartPole-v1', parser_args=args)
         runner.run()
 
+    def test_ddqn_soft_update(self):
+        args = Namespace(**dict(dl_toolbox='torch', device=device, running_steps=n_steps, test_mode=test_mode,
+                                tau=0.005))
+        runner = get_runner(method="ddqn", env='classic_control', env_id='CartPole-v1', parser_args=args)
+        runner.run()
+
     def test_dueldqn(self):
         args = Namespace(**dict(dl_toolbox='torch', device=device, running_steps=n_steps, test_mode=test_mode))
         runner = get_runner(method="dueldqn", env='classic_control', env_id='CartPole-v1', parser_args=args)
@@ -35,6 +45,34 @@ class TestValueBaseAlgo(unittest.TestCase):
         runner = get_runner(method="perdqn", env='classic_control', env_id='CartPole-v1', parser_args=args)
         runner.run()
 
+    def test_perdqn_device_buffer(self):
+        args = Namespace(**dict(dl_toolbox='torch', device=device, running_steps=n_steps, test_mode=test_mode,
+                                use_device_buffer=True))
+        runner = get_runner(method="perdqn", env='classic_control', env_id='CartPole-v1', parser_args=args)
+        runner.run()
+
+    def test_per_device_buffer_priorities(self):
+        memory = PerOffPolicyBuffer_Device(spaces.Box(-1, 1, (2,)), spaces.Discrete(2), None, n_envs=1,
+                                           buffer_size=8, batch_size=4, alpha=0.6, device=device, stage_size=3)
+        for step in range(10):  # the last two steps wrap around to the slots 0 and 1.
+            obs = np.full((1, 2), step, dtype=np.float32)
+            memory.store(obs, np.zeros(1), np.zeros(1), np.zeros(1), obs + 1)
+        self.assertEqual(memory.size, 8)
+        slots = torch.arange(8, device=memory.device).reshape(2, 1, 4)
+        memory.update_priorities(slots[0], torch.full((4,), 1e-8, device=memory.device))
+        memory.update_priorities(slots[1], torch.tensor([1e-8, 100.0, 1e-8, 1e-8], device=memory.device))
+
+        n_high = 0
+        for _ in range(100):
+            samples = memory.sample(beta=0.4)
+            n_high += (samples['step_choices'] == 5).sum().item()
+            self.assertEqual(samples['weights'].dtype, torch.float32)
+        self.assertGreaterEqual(n_high, 0.95 * 100 * 4)
+        samples = memory.sample(beta=0.4)
+        high = samples['step_choices'].flatten() == 5
+        self.assertTrue(torch.all(samples['obs'][high] == 5))
+        self.assertTrue(torch.all(samples['weights'][high] <= samples['weights'].min() + 1e-6))
+
     def test_qrdqn(self):
         args = Namespace(**dict(dl_toolbox='torch', device=device, running_steps=n_steps, test_mode=test_mode))
         runner = get_runner(method="qrdqn", env='classic_control', env_id='CartPole-v1', parser_args=args)
@@ -50,6 +88,12 @@ class TestValueBaseAlgo(unittest.TestCase):
         runner = get_runner(method="drqn", env='classic_control', env_id='CartPole-v1', parser_args=args)
         runner.run()
 
+    def test_drqn_soft_update(self):
+        args = Namespace(**dict(dl_toolbox='torch', device=device, running_steps=n_steps, test_mode=test_mode,
+                                tau=0.005))
+        runner = get_runner(method="drqn", env='classic_control', env_id='CartPole-v1', parser_args=args)
+        runner.run()
+
 
 if __name__ == "__main__":
     unittest.main()
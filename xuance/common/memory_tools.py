@@ -1,6 +1,7 @@
 import random
 import numpy as np
 from gym import Space
+from gym.spaces import Discrete
 from abc import ABC, abstractmethod
 from xuance.common import Optional, Union
 from xuance.common import space2shape, discount_cumsum
@@ -101,6 +102,8 @@ class Buffer(ABC):
         self.observation_space = observation_space
         self.action_space = action_space
         self.auxiliary_shape = auxiliary_info_shape
+        # store discrete actions as int64 indexes, so that learners can use them without casting.
+        self.action_dtype = np.int64 if isinstance(action_space, Discrete) else np.float32
         self.size, self.ptr = 0, 0
 
     def full(self):
@@ -340,7 +343,7 @@ class DummyOffPolicyBuffer(Buffer):
         self.n_size = buffer_size // self.n_envs
         self.observations = create_memory(space2shape(self.observation_space), self.n_envs, self.n_size)
         self.next_observations = create_memory(space2shape(self.observation_space), self.n_envs, self.n_size)
-        self.actions = create_memory(space2shape(self.action_space), self.n_envs, self.n_size)
+        self.actions = create_memory(space2shape(self.action_space), self.n_envs, self.n_size, self.action_dtype)
         self.auxiliary_infos = create_memory(self.auxiliary_shape, self.n_envs, self.n_size)
         self.rewards = create_memory((), self.n_envs, self.n_size)
         self.terminals = create_memory((), self.n_envs, self.n_size)
@@ -348,7 +351,7 @@ class DummyOffPolicyBuffer(Buffer):
     def clear(self):
         self.observations = create_memory(space2shape(self.observation_space), self.n_envs, self.n_size)
         self.next_observations = create_memory(space2shape(self.observation_space), self.n_envs, self.n_size)
-        self.actions = create_memory(space2shape(self.action_space), self.n_envs, self.n_size)
+        self.actions = create_memory(space2shape(self.action_space), self.n_envs, self.n_size, self.action_dtype)
         self.rewards = create_memory((), self.n_envs, self.n_size)
         self.terminals = create_memory((), self.n_envs, self.n_size)
 
@@ -449,7 +452,7 @@ class RecurrentOffPolicyBuffer(Buffer):
 
         samples_dict = {
             'obs': np.array(obs_batch),
-            'actions': np.array(act_batch),
+            'actions': np.array(act_batch, dtype=self.action_dtype),
             'rewards': np.array(rew_batch),
             'terminals': np.array(terminal_batch),
             'batch_size': self.batch_size,
@@ -485,7 +488,7 @@ class PerOffPolicyBuffer(Buffer):
         self.n_size = buffer_size // self.n_envs
         self.observations = create_memory(space2shape(self.observation_space), self.n_envs, self.n_size)
         self.next_observations = create_memory(space2shape(self.observation_space), self.n_envs, self.n_size)
-        self.actions = create_memory(space2shape(self.action_space), self.n_envs, self.n_size)
+        self.actions = create_memory(space2shape(self.action_space), self.n_envs, self.n_size, self.action_dtype)
         self.rewards = create_memory((), self.n_envs, self.n_size)
         self.terminals = create_memory((), self.n_envs, self.n_size)
 
@@ -517,7 +520,7 @@ class PerOffPolicyBuffer(Buffer):
     def clear(self):
         self.observations = create_memory(space2shape(self.observation_space), self.n_envs, self.n_size)
         self.next_observations = create_memory(space2shape(self.observation_space), self.n_envs, self.n_size)
-        self.actions = create_memory(space2shape(self.action_space), self.n_envs, self.n_size)
+        self.actions = create_memory(space2shape(self.action_space), self.n_envs, self.n_size, self.action_dtype)
         self.rewards = create_memory((), self.n_envs, self.n_size)
         self.terminals = create_memory((), self.n_envs, self.n_size)
         self._it_sum = []
@@ -615,7 +618,7 @@ class DummyOffPolicyBuffer_Atari(DummyOffPolicyBuffer):
     def clear(self):
         self.observations = create_memory(space2shape(self.observation_space), self.n_envs, self.n_size, np.uint8)
         self.next_observations = create_memory(space2shape(self.observation_space), self.n_envs, self.n_size, np.uint8)
-        self.actions = create_memory(space2shape(self.action_space), self.n_envs, self.n_size)
+        self.actions = create_memory(space2shape(self.action_space), self.n_envs, self.n_size, self.action_dtype)
         self.auxiliary_infos = create_memory(self.auxiliary_shape, self.n_envs, self.n_size)
         self.rewards = create_memory((), self.n_envs, self.n_size)
         self.terminals = create_memory((), self.n_envs, self.n_size)
@@ -5,6 +5,7 @@ from argparse import Namespace
 from xuance.common import Optional, DummyOffPolicyBuffer, DummyOffPolicyBuffer_Atari
 from xuance.environment import DummyVecEnv
 from xuance.torch import Module
+from xuance.torch.utils import Prefetcher
 from xuance.torch.agents.base import Agent
 
 
@@ -33,6 +34,7 @@ class OffPolicyAgent(Agent):
 
         self.auxiliary_info_shape = None
         self.memory: Optional[DummyOffPolicyBuffer] = None
+        self.prefetcher: Optional[Prefetcher] = None  # stages the next batch on GPU while training, if not None.
 
         self.buffer_size = self.config.buffer_size
         self.batch_size = self.config.batch_size
@@ -107,8 +109,15 @@ class OffPolicyAgent(Agent):
     def train_epochs(self, n_epochs=1):
         train_info = {}
         for _ in range(n_epochs):
-            samples = self.memory.sample()
-            train_info = self.learner.update(**samples)
+            if self.prefetcher is None:
+                samples = self.memory.sample()
+                train_info = self.learner.update(**samples)
+            else:
+                samples = self.prefetcher.next()
+                train_info = self.learner.update(**samples)
+                # sample and copy the next batch while the GPU runs the launched update, the next batch therefore
+                # misses the transitions stored before the next call (at most training_frequency steps).
+                self.prefetcher.preload()
         train_info["epsilon-greedy"] = self.e_greedy
         train_info["noise_scale"] = self.noise_scale
         return train_info
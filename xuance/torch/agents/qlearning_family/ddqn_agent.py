@@ -1,5 +1,7 @@
+import torch
 from argparse import Namespace
 from xuance.environment import DummyVecEnv
+from xuance.torch.utils import Prefetcher
 from xuance.torch.agents.qlearning_family.dqn_agent import DQN_Agent
 
 
@@ -14,4 +16,6 @@ class DDQN_Agent(DQN_Agent):
                  config: Namespace,
                  envs: DummyVecEnv):
         super(DDQN_Agent, self).__init__(config, envs)
+        if torch.device(self.device).type == "cuda":
+            self.prefetcher = Prefetcher(self.memory.sample, self.device)
 
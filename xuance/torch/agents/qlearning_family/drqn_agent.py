@@ -5,7 +5,7 @@ from copy import deepcopy
 from argparse import Namespace
 from xuance.environment import DummyVecEnv
 from xuance.torch import Module
-from xuance.torch.utils import NormalizeFunctions, ActivationFunctions
+from xuance.torch.utils import NormalizeFunctions, ActivationFunctions, Prefetcher
 from xuance.torch.policies import REGISTRY_Policy
 from xuance.torch.agents import OffPolicyAgent
 from xuance.common import RecurrentOffPolicyBuffer, EpisodeBuffer
@@ -31,6 +31,8 @@ class DRQN_Agent(OffPolicyAgent):
         self.policy = self._build_policy()  # build policy
         self.auxiliary_info_shape = {}
         self.memory = self._build_memory(auxiliary_info_shape=self.auxiliary_info_shape)  # build memory
+        if torch.device(self.device).type == "cuda":
+            self.prefetcher = Prefetcher(self.memory.sample, self.device)
         self.learner = self._build_learner(self.config, self.policy)  # build learner
         self.lstm = True if config.rnn == "LSTM" else False
 
@@ -1,9 +1,11 @@
+import torch
 from tqdm import tqdm
 from copy import deepcopy
 from argparse import Namespace
 from xuance.environment import DummyVecEnv
 from xuance.torch.agents.qlearning_family import DQN_Agent
 from xuance.common import PerOffPolicyBuffer
+from xuance.torch.utils import Prefetcher, PerOffPolicyBuffer_Device, PerOffPolicyBuffer_Device_Atari
 
 
 class PerDQN_Agent(DQN_Agent):
@@ -24,21 +26,37 @@ class PerDQN_Agent(DQN_Agent):
         # Create experience replay buffer.
         self.auxiliary_info_shape = {}
         self.atari = True if config.env_name == "Atari" else False
-        self.memory = PerOffPolicyBuffer(observation_space=self.observation_space,
-                                         action_space=self.action_space,
-                                         auxiliary_shape=self.auxiliary_info_shape,
-                                         n_envs=self.n_envs,
-                                         buffer_size=config.buffer_size,
-                                         batch_size=config.batch_size,
-                                         alpha=config.PER_alpha)
+        input_buffer = dict(observation_space=self.observation_space,
+                            action_space=self.action_space,
+                            auxiliary_shape=self.auxiliary_info_shape,
+                            n_envs=self.n_envs,
+                            buffer_size=config.buffer_size,
+                            batch_size=config.batch_size,
+                            alpha=config.PER_alpha)
+        self.use_device_buffer = config.use_device_buffer if hasattr(config, 'use_device_buffer') else False
+        if self.use_device_buffer:
+            # keep the transitions and priorities on the device, the whole buffer must fit in the device memory.
+            Buffer = PerOffPolicyBuffer_Device_Atari if self.atari else PerOffPolicyBuffer_Device
+            self.memory = Buffer(**input_buffer, device=self.device)
+        else:
+            self.memory = PerOffPolicyBuffer(**input_buffer)
+            if torch.device(self.device).type == "cuda":
+                # the sampled step indexes and weights stay on host for update_priorities() of the numpy buffer.
+                self.prefetcher = Prefetcher(self.memory.sample, self.device,
+                                             keys=['obs', 'actions', 'obs_next', 'rewards', 'terminals'])
         self.learner = self._build_learner(self.config, self.policy)
 
     def train_epochs(self, n_epochs=1):
         train_info = {}
         for _ in range(n_epochs):
-            samples = self.memory.sample(self.PER_beta)
+            if self.prefetcher is None:
+                samples = self.memory.sample(self.PER_beta)
+            else:
+                samples = self.prefetcher.next(self.PER_beta)
             td_error, step_info = self.learner.update(**samples)
             self.memory.update_priorities(samples['step_choices'], td_error)
+            if self.prefetcher is not None:
+                self.prefetcher.preload(self.PER_beta)  # sample after the priorities have been updated.
         train_info["epsilon-greedy"] = self.e_greedy
         return train_info
 
@@ -2,7 +2,7 @@ import os
 import torch
 import numpy as np
 from abc import ABC, abstractmethod
-from xuance.common import Optional, List, Union
+from xuance.common import Optional, List, Union, Callable
 from argparse import Namespace
 from operator import itemgetter
 from xuance.torch import Tensor
@@ -10,6 +10,17 @@ from xuance.torch import Tensor
 MAX_GPUs = 100
 
 
+def q_learning_loss(evalQ: Tensor, targetQ: Tensor, next_actions: Tensor, actions: Tensor, rewards: Tensor,
+                    terminals: Tensor, gamma: float):
+    """Returns the MSE loss towards r + gamma * targetQ(s', next_actions) and the Q-values of the taken actions."""
+    # cast to float32 first, so that the Bellman target is not accumulated in bfloat16 under autocast.
+    targetQ = targetQ.float().gather(-1, next_actions.unsqueeze(-1)).squeeze(-1)
+    targetQ = targetQ.masked_fill_(terminals, 0.).mul_(gamma).add_(rewards)
+    predictQ = evalQ.float().gather(-1, actions.unsqueeze(-1)).squeeze(-1)
+    loss = torch.nn.functional.mse_loss(predictQ, targetQ)
+    return loss, predictQ
+
+
 class Learner(ABC):
     def __init__(self,
                  config: Namespace,
@@ -24,6 +35,7 @@ class Learner(ABC):
         self.policy = policy
         self.optimizer: Union[dict, list, Optional[torch.optim.Optimizer]] = None
         self.scheduler: Union[dict, list, Optional[torch.optim.lr_scheduler.LinearLR]] = None
+        self.tau, self.target_stream = None, None  # see _build_target_update().
 
         if self.distributed_training:
             self.world_size = int(os.environ['WORLD_SIZE'])
@@ -43,11 +55,124 @@ class Learner(ABC):
         self.use_grad_clip = config.use_grad_clip
         self.grad_clip_norm = config.grad_clip_norm
         self.device = config.device
+        self.device_type = torch.device(self.device).type
+        self.use_cuda = self.device_type == "cuda"
+        self.use_bf16 = config.use_bf16 if hasattr(config, 'use_bf16') else False  # autocast the network forwards.
+        # the following flags are process-wide and are only switched on by the config.
+        if self.use_cuda and (config.use_tf32 if hasattr(config, 'use_tf32') else False):
+            # use TF32 tensor cores for float32 matmuls and convolutions, which lowers their precision.
+            torch.backends.cuda.matmul.allow_tf32 = True
+            torch.backends.cudnn.allow_tf32 = True
+        if self.use_cuda and (config.cudnn_benchmark if hasattr(config, 'cudnn_benchmark') else False):
+            # let cuDNN tune the kernels for each new input shape, it pays off only if the shapes do not vary.
+            torch.backends.cudnn.benchmark = True
         self.model_dir = config.model_dir
         self.running_steps = config.running_steps
         self.iterations = 0
+        self.log_buffer: List[Tensor] = []  # the training statistics on device, see _collect_info().
+        self.use_compile = config.use_compile if hasattr(config, 'use_compile') else False  # see _build_loss().
+
+    def _to_device(self, data: Union[np.ndarray, torch.Tensor]):
+        """
+        Convert the sampled numpy data to a tensor on the calculating device.
+
+        On CUDA devices, the data is staged in pinned memory so that the host-to-device copy is non-blocking.
+
+        Parameters:
+            data (np.ndarray): The sampled data, or a tensor that has already been staged on the device.
+
+        Returns:
+            The tensor on self.device.
+        """
+        if isinstance(data, torch.Tensor):
+            return data
+        tensor = torch.from_numpy(np.ascontiguousarray(data))
+        if self.use_cuda:
+            return tensor.pin_memory().to(self.device, non_blocking=True)
+        return tensor
+
+    def _build_adam(self, learning_rate: float, eps: float = 1e-5):
+        """Builds the Adam optimizer of the policy, using the fused implementation on CUDA devices."""
+        try:
+            return torch.optim.Adam(self.policy.parameters(), learning_rate, eps=eps, fused=self.use_cuda)
+        except TypeError:  # The fused implementation of Adam is not supported in PyTorch < 1.13.
+            return torch.optim.Adam(self.policy.parameters(), learning_rate, eps=eps)
+
+    def _build_linear_scheduler(self):
+        """
+        Builds the linear learning rate decay of self.optimizer over the running steps.
+
+        The learning rate barely changes per update, so the scheduler is stepped by _step_scheduler() once every
+        config.lr_decay_interval updates (100 by default).
+        """
+        self.lr_decay_interval = self.config.lr_decay_interval if hasattr(self.config, 'lr_decay_interval') else 100
+        return torch.optim.lr_scheduler.LinearLR(self.optimizer, start_factor=1.0, end_factor=0.0,
+                                                 total_iters=max(1, self.running_steps // self.lr_decay_interval))
+
+    def _step_scheduler(self):
+        if self.scheduler is not None and self.iterations % self.lr_decay_interval == 0:
+            self.scheduler.step()
+
+    def _build_loss(self, loss_fn: Callable, **compile_kwargs):
+        """Returns loss_fn, compiled with torch.compile (PyTorch >= 2.0) if config.use_compile is True."""
+        return torch.compile(loss_fn, **compile_kwargs) if self.use_compile else loss_fn
+
+    def _build_target_update(self):
+        """
+        Reads the soft update factor config.tau of the target network, the target network is hard updated every
+        self.sync_frequency updates if it is None. On CUDA devices, the soft updates run on a side stream.
+        """
+        self.tau = self.config.tau if hasattr(self.config, 'tau') else None
+        if self.tau is not None and not hasattr(self.policy, 'soft_update'):
+            raise AttributeError(f"{type(self.policy).__name__} does not support soft updates of the target network, "
+                                 f"please remove tau from the config.")
+        self.target_stream = torch.cuda.Stream(device=self.device) if (self.use_cuda and self.tau is not None) else None
+
+    def _wait_target_update(self):
+        """
+        Makes the current stream wait for the soft update on the side stream.
+
+        Call it before the target forward, and before the policy is saved or loaded.
+        """
+        if self.target_stream is not None:
+            torch.cuda.current_stream(self.device).wait_stream(self.target_stream)
+
+    def _update_target(self):
+        """Updates the target network after the optimizer step."""
+        if self.tau is None:
+            if self.iterations % self.sync_frequency == 0:
+                self.policy.copy_target()
+        elif self.target_stream is None:
+            self.policy.soft_update(self.tau)
+        else:
+            # the soft update overlaps with the next online forward pass.
+            self.target_stream.wait_stream(torch.cuda.current_stream(self.device))
+            with torch.cuda.stream(self.target_stream):
+                self.policy.soft_update(self.tau)
+
+    def _collect_info(self, **stats: Tensor):
+        """
+        Collects the scalar training statistics on device and returns their means once every self.sync_frequency
+        updates, so that they are fetched to host only then.
+
+        Parameters:
+            stats: The scalar tensors to be logged.
+
+        Returns:
+            The averaged statistics and the learning rate, or an empty dict if it is not time to log.
+        """
+        self.log_buffer.append(torch.stack([value.detach().float() for value in stats.values()]))
+        if self.iterations % self.sync_frequency != 0:
+            return {}
+        info = dict(zip(stats.keys(), torch.stack(self.log_buffer).mean(dim=0).tolist()))
+        self.log_buffer.clear()
+        info["learning_rate"] = self.optimizer.param_groups[0]['lr']
+        if self.distributed_training:
+            info = {f"{key}/rank_{self.rank}": value for key, value in info.items()}
+        return info
 
     def save_model(self, model_path):
+        self._wait_target_update()
         torch.save(self.policy.state_dict(), model_path)
         if self.distributed_training:
             self.save_snapshot()
@@ -72,6 +197,7 @@ class Learner(ABC):
             raise RuntimeError(f"There is no model file in '{path}'!")
         model_names.sort()
         model_path = os.path.join(path, model_names[-1])
+        self._wait_target_update()
         self.policy.load_state_dict(torch.load(str(model_path), map_location={
             f"cuda:{i}": self.device for i in range(MAX_GPUs)}))
         print(f"Successfully load model from '{path}'.")
@@ -80,10 +206,12 @@ class Learner(ABC):
     def load_snapshot(self, snapshot_path):
         loc = f"cuda: {self.device}"
         snapshot = torch.load(snapshot_path, map_location=loc)
+        self._wait_target_update()
         self.policy.load_state_dict(snapshot["MODEL_STATE"])
         print("Resuming training from snapshot.")
 
     def save_snapshot(self):
+        self._wait_target_update()
         snapshot = {
             "MODEL_STATE": self.policy.state_dict(),
         }
@@ -6,6 +6,7 @@ Implementation: Pytorch
 import torch
 from torch import nn
 from xuance.torch.learners import Learner
+from xuance.torch.learners.learner import q_learning_loss
 from argparse import Namespace
 
 
@@ -14,57 +15,39 @@ class DDQN_Learner(Learner):
                  config: Namespace,
                  policy: nn.Module):
         super(DDQN_Learner, self).__init__(config, policy)
-        self.optimizer = torch.optim.Adam(self.policy.parameters(), self.config.learning_rate, eps=1e-5)
-        self.scheduler = torch.optim.lr_scheduler.LinearLR(self.optimizer, start_factor=1.0, end_factor=0.0,
-                                                           total_iters=self.config.running_steps)
+        self.optimizer = self._build_adam(self.config.learning_rate, eps=1e-5)
+        self.scheduler = self._build_linear_scheduler()
         self.gamma = config.gamma
         self.sync_frequency = config.sync_frequency
-        self.mse_loss = nn.MSELoss()
-        self.one_hot = nn.functional.one_hot
+        self._build_target_update()
         self.n_actions = self.policy.action_dim
+        self.compute_loss = self._build_loss(q_learning_loss)
 
     def update(self, **samples):
         self.iterations += 1
-        obs_batch = torch.as_tensor(samples['obs'], device=self.device)
-        act_batch = torch.as_tensor(samples['actions'], device=self.device)
-        next_batch = torch.as_tensor(samples['obs_next'], device=self.device)
-        rew_batch = torch.as_tensor(samples['rewards'], device=self.device)
-        ter_batch = torch.as_tensor(samples['terminals'], dtype=torch.float, device=self.device)
-
-        _, _, evalQ = self.policy(obs_batch)
-        _, targetA, targetQ = self.policy.target(next_batch)
-
-        targetA = self.one_hot(targetA, targetQ.shape[-1])
-        targetQ = (targetQ * targetA).sum(dim=-1)
-        targetQ = rew_batch + self.gamma * (1 - ter_batch) * targetQ
-        predictQ = (evalQ * self.one_hot(act_batch.long(), evalQ.shape[1])).sum(dim=-1)
-
-        loss = self.mse_loss(predictQ, targetQ)
-        self.optimizer.zero_grad()
+        obs_batch = self._to_device(samples['obs'])
+        act_batch = self._to_device(samples['actions'])
+        next_batch = self._to_device(samples['obs_next'])
+        rew_batch = self._to_device(samples['rewards'])
+        ter_batch = self._to_device(samples['terminals']).to(torch.bool)
+
+        with torch.autocast(device_type=self.device_type, dtype=torch.bfloat16, enabled=self.use_bf16):
+            _, _, evalQ = self.policy(obs_batch)
+            self._wait_target_update()
+            # the online forward on next_batch is not merged into the one above: the merged batch would be recorded by
+            # autograd, so the backward pass would run on twice the rows and keep twice the activations.
+            with torch.inference_mode():
+                _, next_actions, _ = self.policy(next_batch)  # select next actions with online network.
+                _, _, targetQ = self.policy.target(next_batch)  # evaluate the selected actions with target network.
+        loss, predictQ = self.compute_loss(evalQ, targetQ, next_actions, act_batch, rew_batch, ter_batch, self.gamma)
+
+        self.optimizer.zero_grad(set_to_none=True)
         loss.backward()
         if self.use_grad_clip:
             torch.nn.utils.clip_grad_norm_(self.policy.parameters(), self.grad_clip_norm)
         self.optimizer.step()
-        if self.scheduler is not None:
-            self.scheduler.step()
-
-        # hard update for target network
-        if self.iterations % self.sync_frequency == 0:
-            self.policy.copy_target()
-
-        lr = self.optimizer.state_dict()['param_groups'][0]['lr']
-
-        if self.distributed_training:
-            info = {
-                f"Qloss/rank_{self.rank}": loss.item(),
-                f"learning_rate/rank_{self.rank}": lr,
-                f"predictQ/rank_{self.rank}": predictQ.mean().item()
-            }
-        else:
-            info = {
-                "Qloss": loss.item(),
-                "learning_rate": lr,
-                "predictQ": predictQ.mean().item()
-            }
+        self._step_scheduler()
+        self._update_target()
 
+        info = self._collect_info(Qloss=loss, predictQ=predictQ.mean())
         return info
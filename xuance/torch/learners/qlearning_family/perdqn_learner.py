@@ -5,67 +5,73 @@ Implementation: Pytorch
 """
 import os
 import torch
-import numpy as np
 from torch import nn
 from xuance.common import Optional
+from xuance.torch import Tensor
 from xuance.torch.learners import Learner
 from argparse import Namespace
 
 
+def _perdqn_loss(evalQ: Tensor, targetQ: Tensor, actions: Tensor, rewards: Tensor, terminals: Tensor,
+                 gamma: float):
+    """Returns the MSE loss towards r + gamma * max_a targetQ(s', a), the taken-action Q-values and the targets."""
+    # cast to float32 first, so that the Bellman target is not accumulated in bfloat16 under autocast.
+    targetQ = targetQ.float().max(dim=-1).values
+    targetQ = targetQ.masked_fill_(terminals, 0.).mul_(gamma).add_(rewards)
+    predictQ = evalQ.float().gather(-1, actions.unsqueeze(-1)).squeeze(-1)
+    loss = nn.functional.mse_loss(predictQ, targetQ)
+    return loss, predictQ, targetQ
+
+
 class PerDQN_Learner(Learner):
     def __init__(self,
                  config: Namespace,
                  policy: nn.Module):
         super(PerDQN_Learner, self).__init__(config, policy)
-        self.optimizer = torch.optim.Adam(self.policy.parameters(), self.config.learning_rate, eps=1e-5)
-        self.scheduler = torch.optim.lr_scheduler.LinearLR(self.optimizer, start_factor=1.0, end_factor=0.0,
-                                                           total_iters=self.config.running_steps)
+        self.optimizer = self._build_adam(self.config.learning_rate, eps=1e-5)
+        self.scheduler = self._build_linear_scheduler()
         self.gamma = config.gamma
         self.sync_frequency = config.sync_frequency
-        self.mse_loss = nn.MSELoss()
-        self.one_hot = nn.functional.one_hot
+        self._build_target_update()
         self.n_actions = self.policy.action_dim
+        self.compute_loss = self._build_loss(_perdqn_loss)
 
     def update(self, **samples):
         self.iterations += 1
-        obs_batch = torch.as_tensor(samples['obs'], device=self.device)
-        act_batch = torch.as_tensor(samples['actions'], device=self.device)
-        next_batch = torch.as_tensor(samples['obs_next'], device=self.device)
-        rew_batch = torch.as_tensor(samples['rewards'], device=self.device)
-        ter_batch = torch.as_tensor(samples['terminals'], dtype=torch.float, device=self.device)
+        obs_batch = self._to_device(samples['obs'])
+        act_batch = self._to_device(samples['actions'])
+        next_batch = self._to_device(samples['obs_next'])
+        rew_batch = self._to_device(samples['rewards'])
+        ter_batch = self._to_device(samples['terminals']).to(torch.bool)
 
-        _, _, evalQ = self.policy(obs_batch)
-        _, _, targetQ = self.policy.target(next_batch)
-        targetQ = targetQ.max(dim=-1).values
-        targetQ = rew_batch + self.gamma * (1 - ter_batch) * targetQ
-        predictQ = (evalQ * self.one_hot(act_batch.long(), evalQ.shape[1])).sum(dim=-1)
+        with torch.autocast(device_type=self.device_type, dtype=torch.bfloat16, enabled=self.use_bf16):
+            _, _, evalQ = self.policy(obs_batch)
+            self._wait_target_update()
+            with torch.inference_mode():
+                _, _, targetQ = self.policy.target(next_batch)
+        loss, predictQ, targetQ = self.compute_loss(evalQ, targetQ, act_batch, rew_batch, ter_batch, self.gamma)
 
         td_error = targetQ - predictQ
-        loss = self.mse_loss(predictQ, targetQ)
-        self.optimizer.zero_grad()
+        td_abs = td_error.detach().abs().float()
+        copy_event = None
+        priorities_on_device = isinstance(samples['step_choices'], torch.Tensor)  # the replay buffer is on device.
+        if self.use_cuda and not priorities_on_device:
+            # copy |td_error| to pinned memory without waiting for the backward pass and optimizer step.
+            td_abs_host = torch.empty(td_abs.shape, dtype=td_abs.dtype, pin_memory=True)
+            td_abs_host.copy_(td_abs, non_blocking=True)
+            copy_event = torch.cuda.Event()
+            copy_event.record()
+            td_abs = td_abs_host
+        td_abs = td_abs if priorities_on_device else td_abs.numpy()
+        self.optimizer.zero_grad(set_to_none=True)
         loss.backward()
         if self.use_grad_clip:
             torch.nn.utils.clip_grad_norm_(self.policy.parameters(), self.grad_clip_norm)
         self.optimizer.step()
-        if self.scheduler is not None:
-            self.scheduler.step()
-
-        # hard update for target network
-        if self.iterations % self.sync_frequency == 0:
-            self.policy.copy_target()
-        lr = self.optimizer.state_dict()['param_groups'][0]['lr']
+        self._step_scheduler()
+        self._update_target()
 
-        if self.distributed_training:
-            info = {
-                f"Qloss/rank_{self.rank}": loss.item(),
-                f"learning_rate/rank_{self.rank}": lr,
-                f"predictQ/rank_{self.rank}": predictQ.mean().item()
-            }
-        else:
-            info = {
-                "Qloss": loss.item(),
-                "learning_rate": lr,
-                "predictQ": predictQ.mean().item()
-            }
-        
-        return np.abs(td_error.cpu().detach().numpy()), info
+        info = self._collect_info(Qloss=loss, predictQ=predictQ.mean())
+        if copy_event is not None:
+            copy_event.synchronize()
+        return td_abs, info
@@ -48,8 +48,10 @@ class BasicQnetwork(Module):
         if self.distributed_training:
             self.rank = int(os.environ["RANK"])
             if self.representation._get_name() != "Basic_Identical":
-                self.representation = DistributedDataParallel(module=self.representation, device_ids=[self.rank])
-            self.eval_Qhead = DistributedDataParallel(module=self.eval_Qhead, device_ids=[self.rank])
+                self.representation = DistributedDataParallel(module=self.representation, device_ids=[self.rank],
+                                                              gradient_as_bucket_view=True)
+            self.eval_Qhead = DistributedDataParallel(module=self.eval_Qhead, device_ids=[self.rank],
+                                                      gradient_as_bucket_view=True)
 
     def forward(self, observation: Union[np.ndarray, dict]):
         """
@@ -91,6 +93,13 @@ class BasicQnetwork(Module):
         for ep, tp in zip(self.eval_Qhead.parameters(), self.target_Qhead.parameters()):
             tp.data.copy_(ep)
 
+    def soft_update(self, tau=0.005):
+        eval_params = list(self.representation.parameters()) + list(self.eval_Qhead.parameters())
+        target_params = list(self.target_representation.parameters()) + list(self.target_Qhead.parameters())
+        with torch.no_grad():
+            torch._foreach_mul_(target_params, 1 - tau)
+            torch._foreach_add_(target_params, eval_params, alpha=tau)
+
 
 class DuelQnetwork(Module):
     """
@@ -1007,8 +1016,10 @@ class DRQNPolicy(Module):
         if self.distributed_training:
             self.rank = int(os.environ["RANK"])
             if self.representation._get_name() != "Basic_Identical":
-                self.representation = DistributedDataParallel(module=self.representation, device_ids=[self.rank])
-            self.eval_Qhead = DistributedDataParallel(module=self.eval_Qhead, device_ids=[self.rank])
+                self.representation = DistributedDataParallel(module=self.representation, device_ids=[self.rank],
+                                                              gradient_as_bucket_view=True)
+            self.eval_Qhead = DistributedDataParallel(module=self.eval_Qhead, device_ids=[self.rank],
+                                                      gradient_as_bucket_view=True)
 
     def forward(self, observation: Union[np.ndarray, dict], *rnn_hidden: Tensor):
         """
@@ -1072,3 +1083,10 @@ class DRQNPolicy(Module):
             tp.data.copy_(ep)
         for ep, tp in zip(self.eval_Qhead.parameters(), self.target_Qhead.parameters()):
             tp.data.copy_(ep)
+
+    def soft_update(self, tau=0.005):
+        eval_params = list(self.representation.parameters()) + list(self.eval_Qhead.parameters())
+        target_params = list(self.target_representation.parameters()) + list(self.target_Qhead.parameters())
+        with torch.no_grad():
+            torch._foreach_mul_(target_params, 1 - tau)
+            torch._foreach_add_(target_params, eval_params, alpha=tau)
@@ -13,6 +13,8 @@ from .operations import (init_distributed_mode, update_linear_decay, set_seed,
                          get_flat_grad, get_flat_params, assign_from_flat_grads,
                          assign_from_flat_params, split_distributions, merge_distributions)
 from .value_norm import ValueNorm
+from .prefetcher import Prefetcher
+from .per_buffer import PerOffPolicyBuffer_Device, PerOffPolicyBuffer_Device_Atari
 
 ActivationFunctions = {
     "relu": nn.ReLU,
@@ -0,0 +1,148 @@
+import numpy as np
+import torch
+from gym import Space
+from xuance.common import Optional, Union, Buffer, space2shape
+
+
+class PerOffPolicyBuffer_Device(Buffer):
+    """
+    Prioritized Replay Buffer that keeps the transitions and the priorities on the calculating device.
+
+    The sum segment trees of PerOffPolicyBuffer are replaced by the prefix sum of the priorities, which is searched
+    with torch.searchsorted, so that sampling and updating the priorities need no transfer between host and device.
+    The stored steps are gathered in pinned host memory and copied to the device every stage_size steps on a side
+    CUDA stream. The whole buffer is allocated on the device up front, Dict spaces are not supported.
+
+    Args:
+        observation_space: the observation space of the environment.
+        action_space: the action space of the environment.
+        auxiliary_shape: data shape of auxiliary information (if exists).
+        n_envs: number of parallel environments.
+        buffer_size: the total size of the replay buffer.
+        batch_size: batch size of transition data for a sample.
+        alpha: prioritized factor.
+        device: the calculating device.
+        stage_size: number of steps gathered on host before they are copied to the device.
+    """
+    obs_dtype = torch.float32
+    keys = ('obs', 'actions', 'rewards', 'terminals', 'obs_next')
+
+    def __init__(self,
+                 observation_space: Space,
+                 action_space: Space,
+                 auxiliary_shape: Optional[dict],
+                 n_envs: int,
+                 buffer_size: int,
+                 batch_size: int,
+                 alpha: float = 0.6,
+                 device: Union[str, int, torch.device] = "cuda:0",
+                 stage_size: int = 64):
+        super(PerOffPolicyBuffer_Device, self).__init__(observation_space, action_space, auxiliary_shape)
+        self.obs_shape, self.act_shape = space2shape(self.observation_space), space2shape(self.action_space)
+        if isinstance(self.obs_shape, dict) or isinstance(self.act_shape, dict):
+            raise NotImplementedError("PerOffPolicyBuffer_Device does not support Dict spaces, "
+                                      "please use PerOffPolicyBuffer instead.")
+        self.n_envs, self.batch_size = n_envs, batch_size
+        assert buffer_size % self.n_envs == 0, "buffer_size must be divisible by the number of envs (parallels)"
+        self.n_size = buffer_size // self.n_envs
+        self.n_batch = int(self.batch_size / self.n_envs)
+        self.device = torch.device(device)
+        self.use_cuda = self.device.type == "cuda"
+        self._alpha = alpha
+        self.dtypes = {'obs': self.obs_dtype, 'obs_next': self.obs_dtype,
+                       'actions': torch.int64 if self.action_dtype == np.int64 else torch.float32,
+                       'rewards': torch.float32, 'terminals': torch.float32}
+        self.shapes = {'obs': self.obs_shape, 'obs_next': self.obs_shape, 'actions': self.act_shape,
+                       'rewards': (), 'terminals': ()}
+
+        # two staging memories are used in turn, so that one is filled while the other one is being copied.
+        self.stage_size = min(stage_size, self.n_size)
+        self.stages = [{key: torch.zeros((self.stage_size, self.n_envs) + tuple(self.shapes[key]),
+                                         dtype=self.dtypes[key], pin_memory=self.use_cuda) for key in self.keys}
+                       for _ in range(2)]
+        self.stages_np = [{key: value.numpy() for key, value in stage.items()} for stage in self.stages]
+        self.stream = torch.cuda.Stream(device=self.device) if self.use_cuda else None
+        self.clear()
+
+    def clear(self):
+        # the steps are the leading dimension, so that the staged steps are copied to contiguous memory.
+        self.data = {key: torch.zeros((self.n_size, self.n_envs) + tuple(self.shapes[key]),
+                                      dtype=self.dtypes[key], device=self.device) for key in self.keys}
+        # priorities ** alpha, in float64 like the sum trees, so that the prefix sums keep small priorities apart.
+        self.priorities = torch.zeros((self.n_envs, self.n_size), dtype=torch.float64, device=self.device)
+        self._max_priority = torch.ones(self.n_envs, dtype=torch.float64, device=self.device)
+        self.size, self.ptr = 0, 0
+        self._stage_id, self._stage_ptr, self._n_staged = 0, 0, 0
+        self._copy_events = [None, None]
+
+    def store(self, obs, acts, rews, terminals, next_obs):
+        if self._n_staged == 0 and self._copy_events[self._stage_id] is not None:
+            self._copy_events[self._stage_id].synchronize()  # the staging memory is free to be overwritten.
+        stage = self.stages_np[self._stage_id]
+        for key, value in zip(self.keys, (obs, acts, rews, terminals, next_obs)):
+            stage[key][self._n_staged] = value
+        self._n_staged += 1
+
+        self.ptr = (self.ptr + 1) % self.n_size
+        self.size = min(self.size + 1, self.n_size)
+        if self._n_staged == self.stage_size or self.ptr == 0:
+            self._flush()
+
+    def _flush(self):
+        """Copies the staged steps to the device and sets their priorities to the max priority."""
+        if self._n_staged == 0:
+            return
+        steps = slice(self._stage_ptr, self._stage_ptr + self._n_staged)
+        stage = self.stages[self._stage_id]
+        if self.use_cuda:
+            current_stream = torch.cuda.current_stream(self.device)
+            self.stream.wait_stream(current_stream)  # the queued samples may still read the overwritten steps.
+            with torch.cuda.stream(self.stream):
+                for key in self.keys:
+                    self.data[key][steps].copy_(stage[key][:self._n_staged], non_blocking=True)
+            self._copy_events[self._stage_id] = self.stream.record_event()
+            current_stream.wait_event(self._copy_events[self._stage_id])
+        else:
+            for key in self.keys:
+                self.data[key][steps].copy_(stage[key][:self._n_staged])
+        self.priorities[:, steps] = (self._max_priority ** self._alpha).unsqueeze(1)
+        self._stage_id, self._stage_ptr, self._n_staged = 1 - self._stage_id, self.ptr, 0
+
+    def sample(self, beta):
+        assert beta > 0
+        self._flush()
+
+        priorities = self.priorities[:, :self.size]
+        p_cumsum = priorities.cumsum(dim=1)
+        p_total = p_cumsum[:, -1:]
+        # sample one transition from each of the n_batch equal ranges of the total priority, for each env.
+        mass = torch.arange(self.n_batch, dtype=torch.float64, device=self.device) + \
+            torch.rand(self.n_envs, self.n_batch, dtype=torch.float64, device=self.device)
+        mass = mass * (p_total / self.n_batch)
+        step_choices = torch.searchsorted(p_cumsum, mass).clamp_(max=self.size - 1)
+        env_choices = torch.arange(self.n_envs, device=self.device).repeat_interleave(self.n_batch)
+
+        p_min = priorities.min(dim=1, keepdim=True).values / p_total
+        p_sample = priorities.gather(1, step_choices) / p_total
+        weights = (p_sample / p_min) ** (-beta)  # (N * p_sample) ** (-beta) normalized by the max weight.
+
+        idxes = (step_choices.flatten(), env_choices)
+        samples_dict = {key: self.data[key][idxes] for key in self.keys}
+        samples_dict.update({
+            'weights': weights.float(),
+            'step_choices': step_choices,
+            'batch_size': self.batch_size,
+        })
+        return samples_dict
+
+    def update_priorities(self, idxes: torch.Tensor, priorities: torch.Tensor):
+        priorities = priorities.reshape((self.n_envs, self.n_batch)).double().clamp(min=1e-8)
+        self.priorities.scatter_(1, idxes, priorities ** self._alpha)
+        self._max_priority = torch.maximum(self._max_priority, priorities.max(dim=1).values)
+
+
+class PerOffPolicyBuffer_Device_Atari(PerOffPolicyBuffer_Device):
+    """
+    Prioritized Replay Buffer on the calculating device for Atari tasks, the observations are stored as uint8.
+    """
+    obs_dtype = torch.uint8
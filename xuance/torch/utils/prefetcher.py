@@ -0,0 +1,56 @@
+import numpy as np
+import torch
+from xuance.common import Optional, Sequence, Callable, Union
+
+
+class Prefetcher(object):
+    """
+    Stage the next batch of samples onto the GPU with a side CUDA stream (double buffering).
+
+    The next batch is sampled when preload() is called, so it does not contain the transitions stored after that.
+    Call preload() right after the current update has been launched, the sampling then runs on the host while the
+    GPU is still busy with the update.
+
+    Args:
+        sample_fn (Callable): The function that returns a batch of numpy data, e.g., the sample() of a replay buffer.
+        device (Union[str, int, torch.device]): The CUDA device.
+        keys (Optional[Sequence[str]]): The keys of the data to be staged on the device. Stage all arrays if None.
+    """
+
+    def __init__(self,
+                 sample_fn: Callable[..., dict],
+                 device: Union[str, int, torch.device],
+                 keys: Optional[Sequence[str]] = None):
+        self.sample_fn = sample_fn
+        self.device = torch.device(device)
+        self.keys = keys
+        self.stream = torch.cuda.Stream(device=self.device)
+        self.next_samples = None
+
+    def preload(self, *args, **kwargs):
+        """Samples a batch with sample_fn and copies it to the device asynchronously on the side stream."""
+        samples = self.sample_fn(*args, **kwargs)
+        with torch.cuda.stream(self.stream):
+            for key, value in samples.items():
+                if self.keys is not None and key not in self.keys:
+                    continue
+                if isinstance(value, np.ndarray) and value.dtype != object:
+                    value = torch.from_numpy(np.ascontiguousarray(value)).pin_memory()
+                    samples[key] = value.to(self.device, non_blocking=True)
+        self.next_samples = samples
+
+    def next(self, *args, **kwargs):
+        """
+        Returns the staged batch, the arguments are passed to sample_fn only if no batch has been preloaded.
+
+        The current stream waits for the copies on the side stream before the batch is consumed.
+        """
+        if self.next_samples is None:
+            self.preload(*args, **kwargs)
+        current_stream = torch.cuda.current_stream(self.device)
+        current_stream.wait_stream(self.stream)
+        samples, self.next_samples = self.next_samples, None
+        for value in samples.values():
+            if isinstance(value, torch.Tensor):
+                value.record_stream(current_stream)
+        return samples